@@ -6,8 +6,17 @@ import select
 import sys
 import argparse
 import random
+import errno
+import selectors
+import threading
+
+from probe_output import OutputWriter
+from probe_scheduler import ProbeScheduler
 
 ICMP_ECHO_REQUEST = 8  # ICMP type for Echo Request
+ICMP_ECHO_REPLY = 0  # ICMP type for Echo Reply
+ICMP_RCVBUF = 256 * 1024  # Room for every reply while many probes are in flight
+CONNECT_PENDING = (errno.EINPROGRESS, errno.EWOULDBLOCK, 10035)  # 10035 = WSAEWOULDBLOCK on Windows
 
 def checksum(source_string):
     """Checksum function for verifying the integrity of the ICMP packet"""
@@ -30,9 +39,9 @@ def checksum(source_string):
     answer = answer >> 8 | (answer << 8 & 0xff00)
     return answer
 
-def create_packet(id):
+def create_packet(id, seq=1):
     """Create an ICMP Echo Request packet"""
-    header = struct.pack("bbHHh", ICMP_ECHO_REQUEST, 0, 0, id, 1)
+    header = struct.pack("bbHHh", ICMP_ECHO_REQUEST, 0, 0, id, seq)
     data = bytes(64 * "Q", "utf-8")
     my_checksum = checksum(header + data)
     if sys.platform == "darwin":
@@ -40,7 +49,7 @@ def create_packet(id):
     else:
         my_checksum = socket.htons(my_checksum)
 
-    header = struct.pack("bbHHh", ICMP_ECHO_REQUEST, 0, my_checksum, id, 1)
+    header = struct.pack("bbHHh", ICMP_ECHO_REQUEST, 0, my_checksum, id, seq)
     packet = header + data
     return packet
 
@@ -80,59 +89,61 @@ def udp_server(host='127.0.0.1', port=12345):
     finally:
         server_socket.close()
 
-def udp_client(host='127.0.0.1', port=12345, count=4):
+def udp_client(host='127.0.0.1', port=12345, count=4, quiet=False):
     """
     Client to demonstrate UDP unreliability by sending pings to our UDP server
     """
-    print(f"UDP ping to {host}:{port}")
-    print("This demonstrates UDP's unreliable nature with simulated packet loss and variable RTT")
-    
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    client_socket.settimeout(1)  # 1 second timeout
-    
-    sent = 0
-    received = 0
-    times = []
-    
-    for i in range(count):
-        sent += 1
-        message = f"Ping {i+1} {time.time()}"
-        start_time = time.time()
+    with OutputWriter(quiet=quiet) as out:
+        out.summary(f"UDP ping to {host}:{port}")
+        out.summary("This demonstrates UDP's unreliable nature with simulated packet loss and variable RTT")
+        
+        client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        client_socket.settimeout(1)  # 1 second timeout
         
         try:
-            # Send the message
-            client_socket.sendto(message.encode(), (host, port))
+            sent = 0
+            received = 0
+            times = []
             
-            # Wait for a response
-            data, server = client_socket.recvfrom(1024)
-            end_time = time.time()
-            
-            # Calculate and print RTT
-            rtt = (end_time - start_time) * 1000  # in ms
-            times.append(rtt)
-            received += 1
-            print(f"Reply from {host}: seq={i+1} time={rtt:.2f}ms")
+            for i in range(count):
+                sent += 1
+                message = f"Ping {i+1} {time.time()}"
+                start_time = time.time()
+                
+                try:
+                    # Send the message
+                    client_socket.sendto(message.encode(), (host, port))
+                    
+                    # Wait for a response
+                    data, server = client_socket.recvfrom(1024)
+                    end_time = time.time()
+                    
+                    # Calculate and print RTT
+                    rtt = (end_time - start_time) * 1000  # in ms
+                    times.append(rtt)
+                    received += 1
+                    out.write(f"Reply from {host}: seq={i+1} time={rtt:.2f}ms")
+                
+                except socket.timeout:
+                    out.write(f"Request timed out for seq={i+1}")
+                
+                # Wait a bit before next ping
+                time.sleep(0.5)
             
-        except socket.timeout:
-            print(f"Request timed out for seq={i+1}")
-        
-        # Wait a bit before next ping
-        time.sleep(0.5)
-    
-    # Print statistics, similar to regular ping
-    if received > 0:
-        min_time = min(times)
-        max_time = max(times)
-        avg_time = sum(times) / len(times)
-        print(f"\nUDP Ping statistics for {host}:")
-        print(f"    Packets: Sent = {sent}, Received = {received}, Lost = {sent - received} ({(sent - received) * 100 / sent:.0f}% loss)")
-        print(f"Approximate round trip times in milliseconds:")
-        print(f"    Minimum = {min_time:.2f}ms, Maximum = {max_time:.2f}ms, Average = {avg_time:.2f}ms")
-    else:
-        print(f"\nUDP Ping statistics for {host}:")
-        print(f"    Packets: Sent = {sent}, Received = {received}, Lost = {sent} (100% loss)")
-    
-    client_socket.close()
+            # Print statistics, similar to regular ping
+            if received > 0:
+                min_time = min(times)
+                max_time = max(times)
+                avg_time = sum(times) / len(times)
+                out.summary(f"\nUDP Ping statistics for {host}:")
+                out.summary(f"    Packets: Sent = {sent}, Received = {received}, Lost = {sent - received} ({(sent - received) * 100 / sent:.0f}% loss)")
+                out.summary(f"Approximate round trip times in milliseconds:")
+                out.summary(f"    Minimum = {min_time:.2f}ms, Maximum = {max_time:.2f}ms, Average = {avg_time:.2f}ms")
+            else:
+                out.summary(f"\nUDP Ping statistics for {host}:")
+                out.summary(f"    Packets: Sent = {sent}, Received = {received}, Lost = {sent} (100% loss)")
+        finally:
+            client_socket.close()
 
 def udp_demo():
     """Run a UDP unreliability demonstration"""
@@ -168,18 +179,18 @@ def udp_demo():
 
 def tcp_ping(host, port=80, timeout=1):
     """Ping a host using TCP connection (no admin privileges required)"""
-    start_time = time.time()
+    start_time = time.monotonic()
     
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         sock.settimeout(timeout)
         sock.connect((host, port))
         sock.close()
-        return time.time() - start_time
+        return time.monotonic() - start_time
     except (socket.timeout, socket.error):
         return None
 
-def icmp_ping(dest_addr, timeout=1):
+def icmp_ping(dest_addr, timeout=1, seq=1):
     """Try to ping using ICMP (requires admin privileges)"""
     try:
         icmp = socket.getprotobyname("icmp")
@@ -188,27 +199,29 @@ def icmp_ping(dest_addr, timeout=1):
         sock.settimeout(timeout)
 
         my_id = os.getpid() & 0xFFFF
-        packet = create_packet(my_id)
+        seq &= 0x7FFF  # Sequence is packed as a signed short
+        packet = create_packet(my_id, seq)
 
         try:
             sock.sendto(packet, (dest_addr, 1))
-            start_time = time.time()
+            start_time = time.monotonic()
             
             time_left = timeout
             while True:
-                started_select = time.time()
+                started_select = time.monotonic()
                 readable, _, _ = select.select([sock], [], [], time_left)
-                select_time = time.time() - started_select
+                select_time = time.monotonic() - started_select
                 
                 if not readable:  # Timeout
                     return None
                 
-                receive_time = time.time()
+                receive_time = time.monotonic()
                 packet, addr = sock.recvfrom(1024)
                 icmp_header = packet[20:28]
                 type, code, checksum, packet_id, sequence = struct.unpack("bbHHh", icmp_header)
                 
-                if packet_id == my_id:
+                # Match on the sequence too so a late reply to another probe isn't taken for ours
+                if packet_id == my_id and sequence == seq:
                     return receive_time - start_time
                 
                 time_left -= select_time
@@ -221,59 +234,254 @@ def icmp_ping(dest_addr, timeout=1):
         # Permission denied or other socket error - we'll try TCP instead
         return None
 
-def ping_host(host, count=4, interval=1, port=80, force_tcp=False):
-    """Ping a host using either ICMP (if admin) or TCP (if not)"""
+class PingSession:
+    """
+    Sends pings from the caller's thread and collects replies on a receiver thread
+    send() never waits for a reply, so probes go out on schedule however slow
+    the target is. ICMP probes share one raw socket and replies are matched by
+    sequence number; TCP probes are non-blocking connects watched by a selector.
+    """
+
+    def __init__(self, ip_address, use_icmp, port=80, timeout=1, on_result=None):
+        self.ip_address = ip_address
+        self.use_icmp = use_icmp
+        self.port = port
+        self.timeout = timeout
+        self.on_result = on_result
+        self.results = {}  # seq -> round trip in seconds, or None if lost
+        self.icmp_id = os.getpid() & 0xFFFF
+        self._new = []  # (seq, sent_at, sock) waiting to be picked up by the receiver
+        self._failed = []  # ICMP seqs whose sendto() failed after they were handed over
+        self._closing = False
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+
+        # The sender pokes this socket pair so the receiver notices new probes straight away
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self._wake_send.setblocking(False)
+        self._selector.register(self._wake_recv, selectors.EVENT_READ)
+
+        self._icmp_sock = None
+        if use_icmp:
+            self._icmp_sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.getprotobyname("icmp"))
+            self._icmp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, ICMP_RCVBUF)
+            self._icmp_sock.setblocking(False)
+            self._selector.register(self._icmp_sock, selectors.EVENT_READ)
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def send(self, seq):
+        """Fire off one probe without waiting for its reply"""
+        if self.use_icmp:
+            self._send_icmp(seq)
+        else:
+            self._send_tcp(seq)
+        self._wake()
+
+    def _send_icmp(self, seq):
+        packet = create_packet(self.icmp_id, seq & 0x7FFF)  # Sequence is packed as a signed short
+        # Hand the probe over before sending - on a fast link the reply can beat us back otherwise
+        with self._lock:
+            self._new.append((seq, time.monotonic(), None))
+        try:
+            self._icmp_sock.sendto(packet, (self.ip_address, 1))
+        except OSError:
+            with self._lock:
+                self._failed.append(seq)
+
+    def _send_tcp(self, seq):
+        sock = None
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            sent_at = time.monotonic()
+            err = sock.connect_ex((self.ip_address, self.port))
+            if err != 0 and err not in CONNECT_PENDING:
+                raise OSError(err, os.strerror(err))
+        except OSError:
+            # Refused straight away, out of sockets, etc. - count it as lost
+            if sock is not None:
+                sock.close()
+            self._record(seq, None)
+            return
+
+        # Writability is level-triggered, so a connect that finishes before the receiver registers it isn't missed
+        with self._lock:
+            self._new.append((seq, sent_at, sock))
+
+    def close(self):
+        """Wait for every outstanding probe to reply or time out, then clean up"""
+        with self._lock:
+            self._closing = True
+        self._wake()
+        self._thread.join()
+        self._selector.close()
+        self._wake_recv.close()
+        self._wake_send.close()
+        if self._icmp_sock is not None:
+            self._icmp_sock.close()
+        return self.results
+
+    def _wake(self):
+        try:
+            self._wake_send.send(b"\0")
+        except BlockingIOError:
+            pass  # Receiver already has a wake-up pending
+
+    def _record(self, seq, delay):
+        self.results[seq] = delay
+        if self.on_result is not None:
+            self.on_result(seq, delay)
+
+    def _run(self):
+        """Receiver thread: match replies to probes and expire the ones that time out"""
+        pending = {}  # seq -> (sent_at, sock)
+        icmp_seqs = {}  # Sequence number on the wire -> seq
+        while True:
+            closing = self._collect(pending, icmp_seqs)
+
+            now = time.monotonic()
+            for seq, (sent_at, sock) in list(pending.items()):
+                if now - sent_at >= self.timeout:
+                    self._finish(pending, icmp_seqs, seq, None)
+
+            if closing and not pending:
+                return
+
+            wait = None
+            if pending:
+                wait = max(0, min(sent_at for sent_at, _ in pending.values()) + self.timeout - now)
+
+            for key, _ in self._selector.select(wait):
+                if key.fileobj is self._wake_recv:
+                    self._drain_wake()
+                elif key.fileobj is self._icmp_sock:
+                    self._read_icmp(pending, icmp_seqs)
+                else:
+                    # Non-blocking connect finished - SO_ERROR says whether it worked
+                    received_at = time.monotonic()
+                    seq = key.data
+                    err = key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    delay = received_at - pending[seq][0] if err == 0 else None
+                    self._finish(pending, icmp_seqs, seq, delay)
+
+    def _collect(self, pending, icmp_seqs):
+        """Pick up probes handed over by send() and return whether close() was called"""
+        with self._lock:
+            new, self._new = self._new, []
+            failed, self._failed = self._failed, []
+            closing = self._closing
+        for seq, sent_at, sock in new:
+            pending[seq] = (sent_at, sock)
+            if sock is None:
+                icmp_seqs[seq & 0x7FFF] = seq
+            else:
+                self._selector.register(sock, selectors.EVENT_WRITE, seq)
+        for seq in failed:
+            if seq in pending:
+                self._finish(pending, icmp_seqs, seq, None)
+        return closing
+
+    def _drain_wake(self):
+        try:
+            while self._wake_recv.recv(1024):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _read_icmp(self, pending, icmp_seqs):
+        """Read every queued ICMP packet and settle the probes they answer"""
+        while True:
+            try:
+                packet = self._icmp_sock.recv(2048)
+            except OSError:
+                return  # Nothing left to read (BlockingIOError) or the socket failed
+            received_at = time.monotonic()
+            header_len = (packet[0] & 0x0F) * 4  # IP header length
+            if len(packet) < header_len + 8:
+                continue
+            icmp_type, code, checksum, packet_id, sequence = struct.unpack("bbHHh", packet[header_len:header_len + 8])
+            # Skip our own echo requests (seen when pinging localhost) and other processes' pings
+            if icmp_type != ICMP_ECHO_REPLY or packet_id != self.icmp_id:
+                continue
+            if sequence not in icmp_seqs:
+                # The reply may have beaten the receiver to the probe's hand-over
+                self._collect(pending, icmp_seqs)
+            seq = icmp_seqs.get(sequence)
+            if seq is not None and seq in pending:
+                self._finish(pending, icmp_seqs, seq, received_at - pending[seq][0])
+
+    def _finish(self, pending, icmp_seqs, seq, delay):
+        sent_at, sock = pending.pop(seq)
+        if sock is None:
+            icmp_seqs.pop(seq & 0x7FFF, None)
+        else:
+            self._selector.unregister(sock)
+            sock.close()
+        self._record(seq, delay)
+
+def ping_host(host, count=4, interval=1, port=80, force_tcp=False, quiet=False, burst=1, rate=None):
+    """
+    Ping a host using either ICMP (if admin) or TCP (if not)
+    Probes are sent on a fixed schedule (interval, with up to `burst` back to
+    back and at most `rate` per second overall) while a receiver thread picks
+    up the replies, so a slow or missing reply doesn't hold up the next send.
+    """
     try:
         ip_address = socket.gethostbyname(host)
     except socket.gaierror as e:
         print(f"Cannot resolve {host}: {e}")
         return
 
-    # Try ICMP first unless forced to use TCP
-    if not force_tcp:
-        delay = icmp_ping(ip_address)
-        if delay is not None:
-            print(f"Using ICMP ping (admin privileges detected)")
-            use_icmp = True
+    with OutputWriter(quiet=quiet) as out:
+        # Try ICMP first unless forced to use TCP
+        if not force_tcp:
+            delay = icmp_ping(ip_address, seq=0)
+            if delay is not None:
+                out.summary(f"Using ICMP ping (admin privileges detected)")
+                use_icmp = True
+            else:
+                out.summary(f"Using TCP ping (admin privileges not available)")
+                use_icmp = False
         else:
-            print(f"Using TCP ping (admin privileges not available)")
+            out.summary(f"Using TCP ping (forced by user)")
             use_icmp = False
-    else:
-        print(f"Using TCP ping (forced by user)")
-        use_icmp = False
-    
-    sent = 0
-    received = 0
-    times = []
-    
-    print(f"Pinging {host} [{ip_address}]")
-    
-    for i in range(count):
-        sent += 1
-        if use_icmp:
-            delay = icmp_ping(ip_address)
-        else:
-            delay = tcp_ping(ip_address, port)
-            
-        if delay is None:
-            print(f"Request timed out.")
-        else:
-            received += 1
-            times.append(delay * 1000)  # Convert to ms
-            print(f"Reply from {ip_address}: time={delay * 1000:.2f}ms")
-            
-        if i < count - 1:
-            time.sleep(interval)
-            
-    # Print statistics
-    if received > 0:
-        min_time = min(times)
-        max_time = max(times)
-        avg_time = sum(times) / len(times)
-        print(f"\nPing statistics for {ip_address}:")
-        print(f"    Packets: Sent = {sent}, Received = {received}, Lost = {sent - received} ({(sent - received) * 100 / sent:.0f}% loss)")
-        print(f"Approximate round trip times in milliseconds:")
-        print(f"    Minimum = {min_time:.2f}ms, Maximum = {max_time:.2f}ms, Average = {avg_time:.2f}ms")
+        
+        def report(seq, delay):
+            # Runs on the receiver thread as soon as the reply (or timeout) arrives
+            if delay is None:
+                out.write(f"Request timed out for seq={seq}")
+            else:
+                out.write(f"Reply from {ip_address}: seq={seq} time={delay * 1000:.2f}ms")
+
+        scheduler = ProbeScheduler(per_target_rate=1 / interval if interval > 0 else None,
+                                   global_rate=rate, burst=burst)
+        session = PingSession(ip_address, use_icmp, port, on_result=report)
+        
+        out.summary(f"Pinging {host} [{ip_address}]")
+        
+        try:
+            for seq in range(1, count + 1):
+                scheduler.wait(ip_address)
+                session.send(seq)
+        finally:
+            results = session.close()
+
+        sent = len(results)
+        times = [delay * 1000 for delay in results.values() if delay is not None]  # Convert to ms
+        received = len(times)
+        
+        # Print statistics
+        if received > 0:
+            min_time = min(times)
+            max_time = max(times)
+            avg_time = sum(times) / len(times)
+            out.summary(f"\nPing statistics for {ip_address}:")
+            out.summary(f"    Packets: Sent = {sent}, Received = {received}, Lost = {sent - received} ({(sent - received) * 100 / sent:.0f}% loss)")
+            out.summary(f"Approximate round trip times in milliseconds:")
+            out.summary(f"    Minimum = {min_time:.2f}ms, Maximum = {max_time:.2f}ms, Average = {avg_time:.2f}ms")
 
 def show_options():
     """Display all available options for ping2 command"""
@@ -286,10 +494,15 @@ def show_options():
     print("    -p, --port port       TCP port to use if TCP ping is required (default: 80).")
     print("    -t, --tcp             Force TCP ping even if admin privileges are available.")
     print("    -w, --timeout sec     Timeout in seconds to wait for each reply (default: 1).")
+    print("    -q, --quiet           Only show the summary, not each individual reply.")
+    print("    -b, --burst count     Pings that may be sent back to back before pacing (default: 1).")
+    print("    -r, --rate pps        Upper limit on pings per second (default: no limit).")
     print("\nAdvanced Features:")
     print("    * Automatic fallback to TCP ping when admin privileges aren't available")
     print("    * Detailed statistics (min/max/avg times)")
     print("    * Domain name resolution")
+    print("    * Buffered output on a separate thread so slow consoles don't delay probes")
+    print("    * Drift-free pacing - pings keep going out on schedule while replies are outstanding")
     print("\nExamples:")
     print("    ping2 google.com" + " ( # This will ping google.com 4 times)") 
     print("    ping2 8.8.8.8 -c 10 -i 0.5" + " ( # This will limit the number of pings to 10 and set the interval to 0.5 seconds)")
@@ -338,14 +551,21 @@ def main():
         parser.add_argument("-i", "--interval", type=float, default=1, help="Interval between pings in seconds (default: 1)")
         parser.add_argument("-p", "--port", type=int, default=80, help="TCP port to use if TCP ping is required (default: 80)")
         parser.add_argument("-t", "--tcp", action="store_true", help="Force TCP ping even if admin privileges are available")
+        parser.add_argument("-b", "--burst", type=int, default=1, help="Pings that may be sent back to back before pacing (default: 1)")
+        parser.add_argument("-r", "--rate", type=float, default=None, help="Upper limit on pings per second (default: no limit)")
+        parser.add_argument("-q", "--quiet", action="store_true", help="Only show summary statistics, not each reply")
         parser.add_argument("-u", "--udp-demo", action="store_true", help="Run the UDP unreliability demonstration")
         
         args = parser.parse_args()
+        if args.burst < 1:
+            parser.error("--burst must be at least 1")
+        if args.rate is not None and args.rate <= 0:
+            parser.error("--rate must be greater than 0")
         
         if args.udp_demo:
             udp_demo()
         else:
-            ping_host(args.host, args.count, args.interval, args.port, args.tcp)
+            ping_host(args.host, args.count, args.interval, args.port, args.tcp, args.quiet, args.burst, args.rate)
     else:
         # Run in menu mode
         try:
@@ -0,0 +1,99 @@
+import sys
+import queue
+import threading
+
+_STOP = object()  # Sentinel telling the writer thread to finish
+_PUT_POLL = 0.1  # How often a blocked summary()/close() checks the writer is still running
+
+class OutputWriter:
+    """
+    Buffered console output that runs on its own thread
+    Probe loops hand lines to a bounded queue and carry on immediately, so a
+    slow terminal or pipe never delays the next probe or skews its timing.
+    The writer thread drains the queue in batches and flushes once per batch.
+    If the console goes away (e.g. a closed pipe) the error is kept in
+    `error` and later lines are thrown away instead of hanging the tool.
+    """
+
+    def __init__(self, stream=None, quiet=False, max_lines=1024, batch_size=64):
+        self.stream = stream if stream is not None else sys.stdout
+        self.quiet = quiet
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.error = None
+        self._dropped_lock = threading.Lock()  # write() is called from several probe threads
+        self._queue = queue.Queue(maxsize=max_lines)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, line):
+        """Queue a per-probe line (suppressed in quiet mode, dropped if the queue is full)"""
+        if self.quiet:
+            return
+        # Never block the probe loop - if the consumer can't keep up, drop the line
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+    def summary(self, line):
+        """
+        Queue a header or statistics line (always shown)
+        Waits for room in the queue, so keep it out of timing loops.
+        """
+        self._put(line)
+
+    def _put(self, line):
+        # Wait for room, but give up if the writer thread is gone
+        while self._thread.is_alive():
+            try:
+                self._queue.put(line, timeout=_PUT_POLL)
+                return
+            except queue.Full:
+                continue
+
+    def _run(self):
+        """Writer thread: wait for a line, then grab whatever else is queued"""
+        while True:
+            line = self._queue.get()
+            if line is _STOP:
+                return
+            batch = [line]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    line = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if line is _STOP:
+                    stop = True
+                    break
+                batch.append(line)
+
+            # Once the console has failed keep draining the queue, just don't write
+            if self.error is None:
+                try:
+                    self.stream.write("\n".join(batch) + "\n")
+                    self.stream.flush()
+                except (OSError, ValueError) as e:
+                    self.error = e
+            if stop:
+                return
+
+    def close(self):
+        """Flush everything still queued and stop the writer thread"""
+        self._put(_STOP)
+        self._thread.join()
+        if self.dropped and self.error is None:
+            try:
+                self.stream.write(f"({self.dropped} output lines dropped - console could not keep up)\n")
+                self.stream.flush()
+            except (OSError, ValueError) as e:
+                self.error = e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
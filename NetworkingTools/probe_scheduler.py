@@ -0,0 +1,86 @@
+import time
+import threading
+
+SPIN_THRESHOLD = 0.002  # Busy-wait the last 2ms, time.sleep() isn't precise enough below that
+
+def sleep_until(deadline):
+    """Sleep until the given time.monotonic() deadline, spinning for the final stretch"""
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if remaining > SPIN_THRESHOLD:
+            time.sleep(remaining - SPIN_THRESHOLD)
+        else:
+            time.sleep(0)  # Let the receiver thread have the GIL while we spin
+
+class TokenBucket:
+    """
+    Token bucket that hands out send times instead of blocking
+    Tokens refill at `rate` per second up to `burst`. Taking a token when the
+    bucket is empty puts it into debt, and the returned time is when that debt
+    is paid off - so send times are worked out from the clock, not from how
+    long the previous probe took, and never drift.
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, at):
+        """Take one token no earlier than `at` and return when it may be used"""
+        # Only refill for time that has actually passed since the last reservation
+        at = max(at, self.updated)
+        self.tokens = min(self.burst, self.tokens + (at - self.updated) * self.rate)
+        self.updated = at
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return at
+        return at - self.tokens / self.rate
+
+class ProbeScheduler:
+    """
+    Paces probes against a per-target rate and an optional global rate
+    Call wait(target) right before sending a probe. It first waits for the
+    target's own slot, then takes a global token at that moment, so one busy
+    target booking slots far ahead can't push other targets back. A rate of
+    None means no limit at that level.
+    """
+
+    def __init__(self, per_target_rate=None, global_rate=None, burst=1):
+        self.per_target_rate = per_target_rate
+        self.burst = burst
+        self.global_bucket = TokenBucket(global_rate, burst) if global_rate else None
+        self.target_buckets = {}
+        self.lock = threading.Lock()  # Several threads may share one scheduler
+
+    def reserve_target(self, target):
+        """Book the next per-target slot and return its time.monotonic() deadline"""
+        with self.lock:
+            now = time.monotonic()
+            if not self.per_target_rate:
+                return now
+            bucket = self.target_buckets.get(target)
+            if bucket is None:
+                bucket = TokenBucket(self.per_target_rate, self.burst)
+                self.target_buckets[target] = bucket
+            return bucket.reserve(now)
+
+    def reserve_global(self):
+        """Book the next global slot, starting from now, and return its deadline"""
+        with self.lock:
+            now = time.monotonic()
+            if self.global_bucket is None:
+                return now
+            return self.global_bucket.reserve(now)
+
+    def wait(self, target):
+        """Block until target may be probed again"""
+        sleep_until(self.reserve_target(target))
+        sleep_until(self.reserve_global())
@@ -3,7 +3,7 @@ from setuptools import setup
 setup(
     name="network-tools",
     version="0.1.0",
-    py_modules=["ping2", "traceroute2"],
+    py_modules=["ping2", "traceroute2", "probe_output", "probe_scheduler"],
     entry_points={
         "console_scripts": [
             "ping2=ping2:main",
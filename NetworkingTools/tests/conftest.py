@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tools are installed as top-level modules, so make them importable from the source tree
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,71 @@
+import socket
+import time
+
+from ping2 import PingSession
+from probe_scheduler import ProbeScheduler
+
+def listener(backlog=128):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(backlog)
+    return server
+
+def closed_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def test_tcp_session_reports_each_probe():
+    server = listener()
+    seen = []
+    session = PingSession("127.0.0.1", use_icmp=False, port=server.getsockname()[1],
+                          on_result=lambda seq, delay: seen.append(seq))
+    try:
+        for seq in range(1, 6):
+            session.send(seq)
+    finally:
+        results = session.close()
+        server.close()
+    assert sorted(results) == [1, 2, 3, 4, 5]
+    assert all(delay is not None and delay < 0.5 for delay in results.values())
+    assert sorted(seen) == [1, 2, 3, 4, 5]
+
+def test_tcp_session_counts_refused_as_lost():
+    session = PingSession("127.0.0.1", use_icmp=False, port=closed_port())
+    session.send(1)
+    assert session.close() == {1: None}
+
+def test_sends_stay_on_schedule_while_replies_are_outstanding():
+    # A listener that never accepts stops answering once its backlog is full,
+    # so most probes sit waiting for their timeout
+    server = listener(backlog=1)
+    scheduler = ProbeScheduler(per_target_rate=500)
+    session = PingSession("127.0.0.1", use_icmp=False, port=server.getsockname()[1], timeout=1.5)
+    try:
+        start = time.monotonic()
+        for seq in range(1, 51):
+            scheduler.wait("127.0.0.1")
+            session.send(seq)
+        sending = time.monotonic() - start
+    finally:
+        results = session.close()
+        server.close()
+    assert sending < 0.75  # 50 probes at 500/s, not held up by the 1.5s timeouts
+    assert len(results) == 50
+    assert any(delay is None for delay in results.values())
+
+def test_icmp_session_matches_replies_on_one_socket():
+    try:
+        session = PingSession("127.0.0.1", use_icmp=True, timeout=0.5)
+    except PermissionError:
+        import pytest
+        pytest.skip("raw ICMP sockets need admin privileges")
+    try:
+        for seq in range(1, 101):
+            session.send(seq)
+    finally:
+        results = session.close()
+    assert sorted(results) == list(range(1, 101))
+    assert all(delay is not None for delay in results.values())
@@ -0,0 +1,87 @@
+import io
+import threading
+import time
+
+from probe_output import OutputWriter
+
+class SlowStream(io.StringIO):
+    """A console that takes a while to accept each write"""
+
+    def write(self, text):
+        time.sleep(0.01)
+        return super().write(text)
+
+class BrokenStream(io.StringIO):
+    """A console that has gone away, like a pipe into `head` that has exited"""
+
+    def write(self, text):
+        raise BrokenPipeError(32, "Broken pipe")
+
+def test_lines_are_written_in_order():
+    stream = io.StringIO()
+    with OutputWriter(stream=stream) as out:
+        out.summary("header")
+        for i in range(100):
+            out.write(f"reply {i}")
+        out.summary("statistics")
+    assert stream.getvalue().splitlines() == ["header"] + [f"reply {i}" for i in range(100)] + ["statistics"]
+
+def test_quiet_only_shows_summary():
+    stream = io.StringIO()
+    with OutputWriter(stream=stream, quiet=True) as out:
+        out.write("reply")
+        out.summary("statistics")
+    assert stream.getvalue() == "statistics\n"
+
+def test_close_flushes_everything_queued():
+    stream = SlowStream()
+    out = OutputWriter(stream=stream, batch_size=1)
+    for i in range(5):
+        out.write(f"reply {i}")
+    out.close()
+    assert stream.getvalue().splitlines() == [f"reply {i}" for i in range(5)]
+    assert not out._thread.is_alive()
+
+def test_write_drops_when_full_but_summary_does_not():
+    stream = SlowStream()
+    out = OutputWriter(stream=stream, max_lines=8, batch_size=1)
+    out.summary("header")
+    for i in range(100):
+        out.write(f"reply {i}")
+    out.summary("statistics")
+    out.close()
+
+    lines = stream.getvalue().splitlines()
+    assert out.dropped > 0
+    assert lines[0] == "header"
+    assert lines[-2] == "statistics"
+    assert lines[-1] == f"({out.dropped} output lines dropped - console could not keep up)"
+    assert len(lines) == 100 - out.dropped + 3
+
+def test_dropped_count_is_exact_across_threads():
+    stream = SlowStream()
+    out = OutputWriter(stream=stream, max_lines=4, batch_size=1)
+
+    def flood():
+        for i in range(500):
+            out.write("reply")
+
+    threads = [threading.Thread(target=flood) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    out.close()
+
+    written = stream.getvalue().splitlines().count("reply")
+    assert written + out.dropped == 2000
+
+def test_broken_stream_does_not_hang():
+    out = OutputWriter(stream=BrokenStream(), max_lines=8)
+    for i in range(100):
+        out.write(f"reply {i}")
+    closer = threading.Thread(target=lambda: (out.summary("statistics"), out.close()))
+    closer.start()
+    closer.join(5)
+    assert not closer.is_alive()
+    assert isinstance(out.error, BrokenPipeError)
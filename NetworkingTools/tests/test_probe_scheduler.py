@@ -0,0 +1,74 @@
+import time
+
+from probe_scheduler import ProbeScheduler, TokenBucket, sleep_until
+
+def test_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=10, burst=3)
+    start = bucket.updated
+    slots = [bucket.reserve(start) for _ in range(5)]
+    assert slots[:3] == [start, start, start]
+    assert abs(slots[3] - (start + 0.1)) < 1e-9
+    assert abs(slots[4] - (start + 0.2)) < 1e-9
+
+def test_bucket_deadlines_do_not_drift():
+    # Each reservation is made when the previous slot comes due, late or not,
+    # and slots stay on the original grid
+    bucket = TokenBucket(rate=1000, burst=1)
+    start = bucket.updated
+    at = bucket.reserve(start)
+    for i in range(1, 1000):
+        at = bucket.reserve(at)
+    assert abs(at - (start + 0.999)) < 1e-6
+
+def test_bucket_refills_after_idle_up_to_burst():
+    bucket = TokenBucket(rate=10, burst=2)
+    start = bucket.updated
+    bucket.reserve(start)
+    bucket.reserve(start)
+    later = start + 10
+    assert bucket.reserve(later) == later
+    assert bucket.reserve(later) == later
+    assert abs(bucket.reserve(later) - (later + 0.1)) < 1e-9
+
+def test_bucket_ignores_reservations_from_the_past():
+    bucket = TokenBucket(rate=10, burst=1)
+    start = bucket.updated
+    bucket.reserve(start + 1)
+    # An earlier time must not put the bucket into extra debt
+    assert abs(bucket.reserve(start) - (start + 1.1)) < 1e-9
+
+def test_bucket_rejects_bad_settings():
+    for rate, burst in ((0, 1), (-1, 1), (1, 0)):
+        try:
+            TokenBucket(rate, burst)
+        except ValueError:
+            continue
+        raise AssertionError(f"rate={rate} burst={burst} was accepted")
+
+def test_sleep_until_never_returns_early():
+    deadline = time.monotonic() + 0.0005
+    sleep_until(deadline)
+    assert 0 <= time.monotonic() - deadline < 0.1
+
+def test_sub_millisecond_interval():
+    scheduler = ProbeScheduler(per_target_rate=2000)
+    slots = [scheduler.reserve_target("a") for _ in range(201)]
+    gaps = [later - earlier for earlier, later in zip(slots, slots[1:])]
+    assert all(abs(gap - 0.0005) < 1e-6 for gap in gaps)
+
+def test_busy_target_does_not_hold_back_other_targets():
+    scheduler = ProbeScheduler(per_target_rate=1, global_rate=10)
+    scheduler.wait("a")
+    assert scheduler.reserve_target("a") > time.monotonic() + 0.9  # a's next slot is a second away
+    start = time.monotonic()
+    scheduler.wait("b")
+    assert time.monotonic() - start < 0.5  # ...but b only waits for the 10/s global limit
+
+def test_global_rate_limits_all_targets():
+    scheduler = ProbeScheduler(per_target_rate=1000, global_rate=50)
+    start = time.monotonic()
+    for _ in range(5):
+        for target in ("a", "b"):
+            scheduler.wait(target)
+    # 10 probes at 50/s overall, the first one free
+    assert 0.17 <= time.monotonic() - start < 1
@@ -0,0 +1,29 @@
+import socket
+import time
+
+import traceroute2
+
+def closed_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def test_tcp_attempts_are_paced_start_to_start(monkeypatch):
+    starts = []
+    real_socket = socket.socket
+
+    def recording_socket(*args, **kwargs):
+        starts.append(time.monotonic())
+        return real_socket(*args, **kwargs)
+
+    port = closed_port()
+    monkeypatch.setattr(traceroute2.socket, "socket", recording_socket)
+    traceroute2.tcp_traceroute("127.0.0.1", max_hops=2, port=port, quiet=True, interval=0.05)
+
+    assert len(starts) == 6  # 3 attempts for each of the 2 hops
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert all(gap >= 0.049 for gap in gaps)
+    # The old fixed sleeps came on top of each attempt; now the wait is measured from the last start
+    assert starts[-1] - starts[0] < 1
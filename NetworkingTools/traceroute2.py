@@ -6,6 +6,9 @@ import subprocess
 import re
 import platform
 
+from probe_output import OutputWriter
+from probe_scheduler import ProbeScheduler
+
 def is_admin():
     """Check if the script is running with admin privileges"""
     try:
@@ -17,7 +20,7 @@ def is_admin():
     except:
         return False
 
-def traceroute_subprocess(destination, max_hops=30):
+def traceroute_subprocess(destination, max_hops=30, quiet=False):
     """Use the system's traceroute/tracert command"""
     try:
         cmd = 'tracert' if platform.system() == 'Windows' else 'traceroute'
@@ -30,9 +33,16 @@ def traceroute_subprocess(destination, max_hops=30):
             universal_newlines=True
         )
         
-        # Print output in real-time
+        # Print output in real-time (quiet mode only keeps the final line)
+        last_line = None
         for line in process.stdout:
-            print(line.rstrip())
+            if quiet:
+                if line.strip():
+                    last_line = line.rstrip()
+            else:
+                print(line.rstrip())
+        if last_line is not None:
+            print(last_line)
         
         process.wait()
         return True
@@ -40,110 +50,120 @@ def traceroute_subprocess(destination, max_hops=30):
         print(f"Error using system traceroute: {e}")
         return False
 
-def tcp_traceroute(destination, max_hops=30, timeout=1, port=80):
-    """Perform traceroute using TCP connections - works without admin privileges"""
+def tcp_traceroute(destination, max_hops=30, timeout=1, port=80, quiet=False, interval=0.2):
+    """
+    Perform traceroute using TCP connections - works without admin privileges
+    Attempts start at most once per `interval` seconds, measured from when the
+    previous attempt started rather than when it finished.
+    """
     try:
         dest_ip = socket.gethostbyname(destination)
     except socket.gaierror:
         print(f"Cannot resolve {destination}: Unknown host")
         return False
     
-    print(f"Tracing route to {destination} [{dest_ip}]")
-    print(f"over a maximum of {max_hops} hops:\n")
-    
-    for ttl in range(1, max_hops + 1):
-        # Try up to 3 times for each hop
-        successes = []
-        timeouts = 0
+    scheduler = ProbeScheduler(per_target_rate=1 / interval if interval > 0 else None)
+    with OutputWriter(quiet=quiet) as out:
+        out.summary(f"Tracing route to {destination} [{dest_ip}]")
+        out.summary(f"over a maximum of {max_hops} hops:\n")
         
-        for attempt in range(3):
-            start_time = time.time()
+        for ttl in range(1, max_hops + 1):
+            # Try up to 3 times for each hop
+            successes = []
+            timeouts = 0
+            reached = None  # Shown once the hop's attempts are done, outside the timing loop
+            finished = False
             
-            try:
-                # Create TCP socket with the specified TTL
-                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                s.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
-                s.settimeout(timeout)
-                
-                # Start connection attempt to destination
-                err = s.connect_ex((dest_ip, port))
-                end_time = time.time()
+            for attempt in range(3):
+                scheduler.wait(dest_ip)
+                start_time = time.monotonic()
                 
-                # Calculate round-trip time
-                rtt = (end_time - start_time) * 1000  # ms
-                
-                if err == 0:
-                    # Connection succeeded - we've reached the destination
-                    successes.append(rtt)
-                    if attempt == 0:  # Only print on first success
-                        print(f"{ttl:2d}  {rtt:.1f} ms  {dest_ip}  Destination reached")
-                    if ttl == max_hops:
-                        return True
-                elif err == 10060:  # Timeout
-                    timeouts += 1
-                elif err == 10061:  # Connection refused - we've reached the destination but port is closed
-                    successes.append(rtt)
-                    if attempt == 0:  # Only print on first success
-                        print(f"{ttl:2d}  {rtt:.1f} ms  {dest_ip}  Destination reached (port closed)")
-                    return True
-                elif err == 10064:  # Host unreachable
-                    if attempt == 0:
-                        print(f"{ttl:2d}  *  Host unreachable")
+                try:
+                    # Create TCP socket with the specified TTL
+                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    s.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+                    s.settimeout(timeout)
+                    
+                    # Start connection attempt to destination
+                    err = s.connect_ex((dest_ip, port))
+                    end_time = time.monotonic()
+                    
+                    # Calculate round-trip time
+                    rtt = (end_time - start_time) * 1000  # ms
+                    
+                    if err == 0:
+                        # Connection succeeded - we've reached the destination
+                        successes.append(rtt)
+                        if attempt == 0:  # Only print on first success
+                            reached = f"{ttl:2d}  {rtt:.1f} ms  {dest_ip}  Destination reached"
+                        if ttl == max_hops:
+                            finished = True
+                            break
+                    elif err == 10060:  # Timeout
+                        timeouts += 1
+                    elif err == 10061:  # Connection refused - we've reached the destination but port is closed
+                        successes.append(rtt)
+                        if attempt == 0:  # Only print on first success
+                            reached = f"{ttl:2d}  {rtt:.1f} ms  {dest_ip}  Destination reached (port closed)"
+                        finished = True
+                        break
+                    elif err == 10064:  # Host unreachable
+                        if attempt == 0:
+                            out.write(f"{ttl:2d}  *  Host unreachable")
+                        timeouts += 1
+                    else:
+                        # For TTL exceeded errors, Windows doesn't tell us the IP that responded
+                        # But if we got here, we at least know a router exists at this hop
+                        if attempt == 0:
+                            out.write(f"{ttl:2d}  {rtt:.1f} ms  (Intermediate hop)")
+                        successes.append(rtt)
+                except socket.timeout:
                     timeouts += 1
-                else:
-                    # For TTL exceeded errors, Windows doesn't tell us the IP that responded
-                    # But if we got here, we at least know a router exists at this hop
-                    if attempt == 0:
-                        print(f"{ttl:2d}  {rtt:.1f} ms  (Intermediate hop)")
-                    successes.append(rtt)
-            except socket.timeout:
-                timeouts += 1
-            except socket.error as e:
-                if "TTL expired" in str(e):
-                    rtt = (time.time() - start_time) * 1000
-                    successes.append(rtt)
-                    if attempt == 0:
-                        print(f"{ttl:2d}  {rtt:.1f} ms  (Intermediate hop)")
-                else:
-                    if attempt == 0:
-                        print(f"{ttl:2d}  *  Error: {e}")
-                    timeouts += 1
-            finally:
-                s.close()
+                except socket.error as e:
+                    if "TTL expired" in str(e):
+                        rtt = (time.monotonic() - start_time) * 1000
+                        successes.append(rtt)
+                        if attempt == 0:
+                            out.write(f"{ttl:2d}  {rtt:.1f} ms  (Intermediate hop)")
+                    else:
+                        if attempt == 0:
+                            out.write(f"{ttl:2d}  *  Error: {e}")
+                        timeouts += 1
+                finally:
+                    s.close()
             
-            # Short delay between attempts
-            if attempt < 2:
-                time.sleep(0.2)
+            # After all attempts
+            if reached is not None:
+                out.summary(reached)
+            if finished:
+                return True
+            if timeouts == 3:
+                out.write(f"{ttl:2d}  *  *  *  Request timed out.")
+            elif not successes and ttl == max_hops:
+                out.summary(f"Trace complete - maximum hops ({max_hops}) reached")
+                return True
         
-        # After all attempts
-        if timeouts == 3:
-            print(f"{ttl:2d}  *  *  *  Request timed out.")
-        elif not successes and ttl == max_hops:
-            print(f"Trace complete - maximum hops ({max_hops}) reached")
-            return True
-            
-        # Small delay before next hop
-        time.sleep(0.1)
-    
-    print(f"Trace complete - maximum hops ({max_hops}) reached")
-    return True
+        out.summary(f"Trace complete - maximum hops ({max_hops}) reached")
+        return True
 
-def traceroute(destination, max_hops=30, timeout=1):
+def traceroute(destination, max_hops=30, timeout=1, quiet=False, interval=0.2):
     """Select the best available traceroute method"""
     # Try to use the system's traceroute/tracert command first
-    if traceroute_subprocess(destination, max_hops):
+    if traceroute_subprocess(destination, max_hops, quiet):
         return
     
     # Fall back to our TCP implementation if the system command fails
     print("\nSystem traceroute failed. Using TCP-based traceroute instead.\n")
-    tcp_traceroute(destination, max_hops, timeout)
+    tcp_traceroute(destination, max_hops, timeout, quiet=quiet, interval=interval)
 
 def show_options():
     """Display available options for traceroute2"""
-    print("\nUsage: traceroute2 [-m max_hops] [-w timeout] target_name")
+    print("\nUsage: traceroute2 [-m max_hops] [-w timeout] [-i interval] [-q] target_name")
     print("\nOptions:")
     print("    -m, --max-hops       Maximum number of hops to search for target")
     print("    -w, --timeout        Wait timeout seconds for each reply")
+    print("    -i, --interval       Seconds between TCP probe starts (default: 0.2)")
+    print("    -q, --quiet          Only show where the trace ended, not every hop")
     print("\nExamples:")
     print("    traceroute2 google.com")
     print("    traceroute2 8.8.8.8 -m 15 -w 2")
@@ -188,9 +208,13 @@ def main():
                           help="Maximum number of hops (default: 30)")
         parser.add_argument("-w", "--timeout", type=float, default=1, 
                           help="Timeout in seconds for each reply (default: 1)")
+        parser.add_argument("-i", "--interval", type=float, default=0.2, 
+                          help="Seconds between TCP probe starts (default: 0.2)")
+        parser.add_argument("-q", "--quiet", action="store_true", 
+                          help="Only show where the trace ended, not every hop")
         
         args = parser.parse_args()
-        traceroute(args.host, args.max_hops, args.timeout)
+        traceroute(args.host, args.max_hops, args.timeout, args.quiet, args.interval)
     else:
         # Run in menu mode
         try: